@@ -0,0 +1,29 @@
+"""
+SST 2.0 Backend gunicorn configuration
+Usage: gunicorn -c gunicorn.conf.py server:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+
+# Threaded workers: requests mostly wait on SQLite I/O, so threads let each
+# worker overlap them while multiple workers use every core.
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, os.cpu_count() or 1)))
+worker_class = 'gthread'
+threads = 4
+
+# Import the app once in the master so workers fork with a warm,
+# copy-on-write shared heap. The connection pools in server.py open their
+# connections lazily on the first request, and the master never serves
+# requests, so each worker builds its own pool and none is shared across
+# the fork.
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+
+def on_starting(server):
+    """Ensure DB tables exist before any worker starts serving"""
+    from server import init_database
+    init_database()
@@ -43,7 +43,8 @@ def main():
     
     # Set environment variables
     os.environ['FLASK_APP'] = 'server.py'
-    os.environ['FLASK_ENV'] = 'development'
+    os.environ.setdefault('FLASK_ENV', 'development')
+    debug = os.environ['FLASK_ENV'] == 'development'
     
     # Get port from environment or use default
     port = os.environ.get('PORT', '5001')
@@ -56,10 +57,12 @@ def main():
     
     try:
         # Import and run the server
-        from server import app, init_database
+        from server import app, init_database, serve_with_gunicorn
+        if os.environ['FLASK_ENV'] == 'production':
+            serve_with_gunicorn()
         # Ensure DB tables exist when starting via this script
         init_database()
-        app.run(host='0.0.0.0', port=int(port), debug=True)
+        app.run(host='0.0.0.0', port=int(port), debug=debug)
     except KeyboardInterrupt:
         logger.info("\n🛑 Server stopped by user")
     except Exception as e:
@@ -6,87 +6,348 @@ Handles user registration, authentication, and database operations
 
 import os
 import sys
+import importlib
+import functools
+import contextlib
+import queue
 import json
 import sqlite3
 import hashlib
-import secrets
+import hmac
+import base64
+import time
+import threading
 from datetime import datetime
 from flask import Flask, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import logging
 
-# Add parent directory to path to import database modules
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
-
 try:
-    from database_manager.database import DatabaseManager
-    from database_manager.create_companies_table import create_companies_table
-    from database_manager.create_opportunities_table import create_opportunities_table
+    import orjson
 except ImportError:
-    print("Warning: Database modules not found. Using fallback database operations.")
-    DatabaseManager = None
+    orjson = None
+
+# Optional helpers from the parent project's database_manager package. They
+# are not needed to serve requests, so import them only on first access.
+_DATABASE_MANAGER_EXPORTS = {
+    'DatabaseManager': 'database_manager.database',
+    'create_companies_table': 'database_manager.create_companies_table',
+    'create_opportunities_table': 'database_manager.create_opportunities_table',
+}
+
+def __getattr__(name):
+    """Lazily import the database_manager helpers (PEP 562)"""
+    module_name = _DATABASE_MANAGER_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    # Add parent directory to path to import database modules
+    parent_dir = os.path.join(os.path.dirname(__file__), '..', '..')
+    if parent_dir not in sys.path:
+        sys.path.append(parent_dir)
+    
+    try:
+        value = getattr(importlib.import_module(module_name), name)
+    except ImportError:
+        print("Warning: Database modules not found. Using fallback database operations.")
+        value = None
+    globals()[name] = value
+    return value
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for jsonify() and request.get_json()"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
+else:
+    logger.warning("orjson not installed. Using the standard library JSON provider.")
 CORS(app)
 
 # Database configuration
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database(s)', 'companies.db')
 OPPORTUNITIES_DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database(s)', 'opportunities.db')
 
+# Opportunities list cache. The opportunities DB is loaded by an external
+# process, so serving a page that is up to a minute old is acceptable.
+OPPORTUNITIES_CACHE_TTL = 60  # seconds
+OPPORTUNITIES_CACHE_MAX_ENTRIES = 256
+# Bound memory by rows held, not just entries; large pages are not cached
+OPPORTUNITIES_CACHE_MAX_ROWS = 5000
+OPPORTUNITIES_CACHE_MAX_PAGE_ROWS = 100
+OPPORTUNITIES_CACHE_CONTROL = 'public, max-age=30'
+# Largest page a client may request (matches lengthMenu in database.js)
+OPPORTUNITIES_MAX_PAGE_LENGTH = 1000
+_opportunities_cache = {}
+_opportunities_cache_rows = 0
+_opportunities_cache_lock = threading.Lock()
+
+# Full-text index over the searchable opportunity columns. It is an external
+# content table kept in sync with opportunities by triggers. The trigram
+# tokenizer (SQLite >= 3.34) keeps matches substring-equivalent to LIKE, so
+# "123" still finds "ABC123" and "ware" still finds "Software".
+OPPORTUNITIES_FTS_TABLE_SQL = '''
+    CREATE VIRTUAL TABLE opportunities_fts USING fts5(
+        notice_id, title, agency, department, naics, psc,
+        content='opportunities', content_rowid='rowid', tokenize='trigram'
+    )
+'''
+# Trigram queries need at least this many characters; shorter searches use LIKE
+OPPORTUNITIES_FTS_MIN_SEARCH = 3
+OPPORTUNITIES_FTS_TRIGGERS = ('opportunities_fts_ai', 'opportunities_fts_ad', 'opportunities_fts_au')
+# Recreates the sync triggers and repopulates the index from opportunities
+OPPORTUNITIES_FTS_SYNC_SQL = '''
+    CREATE TRIGGER IF NOT EXISTS opportunities_fts_ai AFTER INSERT ON opportunities BEGIN
+        INSERT INTO opportunities_fts(rowid, notice_id, title, agency, department, naics, psc)
+        VALUES (new.rowid, new.notice_id, new.title, new.agency, new.department, new.naics, new.psc);
+    END;
+    CREATE TRIGGER IF NOT EXISTS opportunities_fts_ad AFTER DELETE ON opportunities BEGIN
+        INSERT INTO opportunities_fts(opportunities_fts, rowid, notice_id, title, agency, department, naics, psc)
+        VALUES ('delete', old.rowid, old.notice_id, old.title, old.agency, old.department, old.naics, old.psc);
+    END;
+    CREATE TRIGGER IF NOT EXISTS opportunities_fts_au AFTER UPDATE ON opportunities BEGIN
+        INSERT INTO opportunities_fts(opportunities_fts, rowid, notice_id, title, agency, department, naics, psc)
+        VALUES ('delete', old.rowid, old.notice_id, old.title, old.agency, old.department, old.naics, old.psc);
+        INSERT INTO opportunities_fts(rowid, notice_id, title, agency, department, naics, psc)
+        VALUES (new.rowid, new.notice_id, new.title, new.agency, new.department, new.naics, new.psc);
+    END;
+    INSERT INTO opportunities_fts(opportunities_fts) VALUES ('rebuild');
+'''
+# Fallback when FTS5 is unavailable: one LIKE scan over the searchable columns
+# joined by a unit separator (so a match cannot span two columns), instead of
+# six COALESCE + LIKE predicates each with its own bound parameter
+OPPORTUNITIES_SEARCH_BLOB = " || char(31) || ".join(
+    f"COALESCE({column},'')" for column in ('notice_id', 'title', 'agency', 'department', 'naics', 'psc')
+)
+
+# DataTables column index -> DB column for ORDER BY
+# 0 interested (virtual), 1 notice_id, 2 title, 3 agency, 4 department,
+# 5 naics, 6 psc, 7 type, 8 posted_date, 9 response_due_date, 10 setaside
+OPPORTUNITIES_ORDER_COLUMNS = {
+    '1': 'notice_id',
+    '2': 'title',
+    '3': 'agency',
+    '4': 'department',
+    '5': 'naics',
+    '6': 'psc',
+    '7': 'notice_type',
+    '8': 'posted_date',
+    '9': 'response_due_date',
+    '10': 'setaside'
+}
+OPPORTUNITIES_ORDER_DIRECTIONS = {'asc': 'ASC', 'desc': 'DESC'}
+
+# WHERE clause per search mode: no search, FTS5 match, or the LIKE fallback
+OPPORTUNITIES_WHERE = {
+    'all': '',
+    # The FTS match is only a pre-filter: the LIKE on top means a stale index
+    # can miss rows but never return rows that don't match
+    'fts': f'''WHERE rowid IN (SELECT rowid FROM opportunities_fts WHERE opportunities_fts MATCH ?)
+        AND {OPPORTUNITIES_SEARCH_BLOB} LIKE ?''',
+    'like': f'WHERE {OPPORTUNITIES_SEARCH_BLOB} LIKE ?',
+}
+
+# The filtered total rides along on every row. For searches a window count
+# lets the filter run once per page; without a filter an uncorrelated subquery
+# is used instead, because COUNT(*) OVER() would stop SQLite from walking the
+# ORDER BY index and force a full scan plus sort on every page.
+OPPORTUNITIES_TOTAL = {
+    'all': '(SELECT COUNT(*) FROM opportunities)',
+    'fts': 'COUNT(*) OVER()',
+    'like': 'COUNT(*) OVER()',
+}
+
+# Every page query is built once here, so a request only does a dict lookup
+# and nothing from the request is ever interpolated into SQL
+OPPORTUNITIES_PAGE_SQL = {
+    (mode, column, direction): f"""
+        SELECT
+            notice_id,
+            title,
+            agency,
+            department,
+            naics,
+            psc,
+            notice_type,
+            posted_date,
+            response_due_date,
+            setaside,
+            {OPPORTUNITIES_TOTAL[mode]} AS _total
+        FROM opportunities
+        {where_clause}
+        ORDER BY {column} {direction}
+        LIMIT ? OFFSET ?
+    """
+    for mode, where_clause in OPPORTUNITIES_WHERE.items()
+    for column in OPPORTUNITIES_ORDER_COLUMNS.values()
+    for direction in OPPORTUNITIES_ORDER_DIRECTIONS.values()
+}
+OPPORTUNITIES_COUNT_SQL = {
+    mode: f"SELECT COUNT(1) as cnt FROM opportunities {where_clause}"
+    for mode, where_clause in OPPORTUNITIES_WHERE.items()
+}
+
+# Set once init_opportunities_search() has confirmed the FTS table exists, and
+# cleared if the sync triggers later disappear (e.g. the loader recreated the
+# table while the server was running)
+_opportunities_fts_ready = False
+# How often a running server re-checks that the FTS sync triggers still exist
+OPPORTUNITIES_FTS_CHECK_INTERVAL = 30  # seconds
+_opportunities_fts_checked_at = 0.0
+
+# Connection tuning applied once when a pooled connection is opened
+DB_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+)
+# The opportunities DB is owned by an external loader, so leave its journal
+# mode alone and only tune the read side
+OPPORTUNITIES_PRAGMAS = (
+    'PRAGMA query_only=ON',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+)
+
 def get_db_connection():
     """Get database connection"""
     conn = sqlite3.connect(DATABASE_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
+# Opening a SQLite connection and applying its PRAGMAs costs several
+# milliseconds, which dominated the fast endpoints. Connections are checked out
+# per request and returned afterwards, so they are reused across threads (the
+# dev server starts a new thread for every request). The pool never blocks:
+# when it is empty a new connection is opened, and connections beyond `size`
+# are closed when returned.
+class SQLiteConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections"""
+
+    def __init__(self, path, pragmas, isolation_level='', size=8):
+        self.path = path
+        self.pragmas = pragmas
+        self.isolation_level = isolation_level
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=self.isolation_level, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def get(self):
+        """Check out an idle connection, opening a new one if none is available"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def put(self, conn):
+        """Return a connection without any half-finished transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        conn = self.get()
+        try:
+            yield conn
+        finally:
+            self.put(conn)
+
+# Companies DB: autocommit; multi-statement writes open explicit transactions
+db_pool = SQLiteConnectionPool(DATABASE_PATH, DB_PRAGMAS, isolation_level=None)
+# Opportunities DB: read-only autocommit
+opportunities_pool = SQLiteConnectionPool(OPPORTUNITIES_DB_PATH, OPPORTUNITIES_PRAGMAS, isolation_level=None)
+
 # --- Lightweight schema migration helpers ---
 
-def _table_has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+# Stored in PRAGMA user_version once tables and migrations are in place.
+# Bump it whenever the tables or COMPANIES_REQUIRED_COLUMNS change.
+SCHEMA_VERSION = 1
+
+# Columns required by current code that older companies tables may lack
+COMPANIES_REQUIRED_COLUMNS = (
+    ('name', "TEXT"),
+    ('primary_psc', "TEXT"),
+    ('secondary_psc', "TEXT"),
+    ('psc_description', "TEXT"),
+    ('primary_keywords', "TEXT DEFAULT ''"),
+    ('secondary_keywords', "TEXT"),
+    ('capabilities', "TEXT"),
+    ('certifications', "TEXT"),
+    ('created_by', "INTEGER"),
+    # SQLite rejects ADD COLUMN with a non-constant default on non-empty tables
+    ('updated_at', "DATETIME"),
+)
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set:
     cur = conn.execute(f"PRAGMA table_info({table})")
-    cols = [r[1] for r in cur.fetchall()]
-    return column in cols
-
-def _ensure_column(conn: sqlite3.Connection, table: str, column: str, ddl: str):
-    if not _table_has_column(conn, table, column):
-        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return {r[1] for r in cur.fetchall()}
 
-def migrate_database():
+def migrate_database(conn: sqlite3.Connection):
     """Add any missing columns required by current code to existing tables."""
-    try:
-        conn = get_db_connection()
-        # Companies table required columns
-        # Add uuid column without UNIQUE constraint, then create a unique index
-        if not _table_has_column(conn, 'companies', 'uuid'):
-            conn.execute("ALTER TABLE companies ADD COLUMN uuid TEXT")
-            try:
-                conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_uuid ON companies(uuid)")
-            except Exception:
-                pass
-        _ensure_column(conn, 'companies', 'name', "TEXT")
-        _ensure_column(conn, 'companies', 'primary_psc', "TEXT")
-        _ensure_column(conn, 'companies', 'secondary_psc', "TEXT")
-        _ensure_column(conn, 'companies', 'psc_description', "TEXT")
-        _ensure_column(conn, 'companies', 'primary_keywords', "TEXT DEFAULT ''")
-        _ensure_column(conn, 'companies', 'secondary_keywords', "TEXT")
-        _ensure_column(conn, 'companies', 'capabilities', "TEXT")
-        _ensure_column(conn, 'companies', 'certifications', "TEXT")
-        _ensure_column(conn, 'companies', 'created_by', "INTEGER")
-        _ensure_column(conn, 'companies', 'updated_at', "DATETIME DEFAULT CURRENT_TIMESTAMP")
-        conn.commit()
-        conn.close()
-        logger.info("Database migration check completed")
-    except Exception as e:
-        logger.error(f"Database migration failed: {e}")
+    existing = _table_columns(conn, 'companies')
+    
+    # Add uuid column without UNIQUE constraint, then create a unique index
+    statements = []
+    if 'uuid' not in existing:
+        statements.append("ALTER TABLE companies ADD COLUMN uuid TEXT")
+    for column, ddl in COMPANIES_REQUIRED_COLUMNS:
+        if column not in existing:
+            statements.append(f"ALTER TABLE companies ADD COLUMN {column} {ddl}")
+    
+    if statements:
+        conn.execute('BEGIN')
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    if 'uuid' not in existing:
+        try:
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_uuid ON companies(uuid)")
+        except Exception:
+            pass
+    logger.info("Database migration check completed")
 
 def init_database():
-    """Initialize database tables"""
+    """Initialize database tables and run migrations, unless the schema is already current"""
     try:
         conn = get_db_connection()
         
+        # Skip table creation and migrations when the schema is already current
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            conn.close()
+            logger.info(f"Database schema is up to date (version {version})")
+            init_opportunities_search()
+            return
+        
         # Create users table
         conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -162,74 +423,214 @@ def init_database():
         ''')
         
         conn.commit()
+        
+        # Ensure migrations for older DBs
+        migrate_database(conn)
+        
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         conn.close()
         logger.info("Database initialized successfully")
         
-        # Ensure migrations for older DBs
-        migrate_database()
+        init_opportunities_search()
         
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
 
+def init_opportunities_search():
+    """Create sort/filter indexes and the FTS5 search table on the opportunities DB"""
+    global _opportunities_fts_ready
+    conn = None
+    try:
+        conn = sqlite3.connect(OPPORTUNITIES_DB_PATH)
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'opportunities'"
+        ).fetchone()
+        if not has_table:
+            logger.warning("Opportunities table not found. Skipping search index setup.")
+            return
+        
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_opps_posted ON opportunities(posted_date DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_opps_notice ON opportunities(notice_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_opps_agency ON opportunities(agency)')
+        conn.commit()
+        
+        fts = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'opportunities_fts'"
+        ).fetchone()
+        has_fts = fts is not None and 'trigram' in fts[0]
+        if fts is not None and not has_fts:
+            # Built with word tokens by an earlier version; replace it
+            conn.executescript(
+                ''.join(f'DROP TRIGGER IF EXISTS {name};' for name in OPPORTUNITIES_FTS_TRIGGERS)
+                + 'DROP TABLE opportunities_fts;'
+            )
+        if not has_fts:
+            conn.execute(OPPORTUNITIES_FTS_TABLE_SQL)
+        
+        # A loader that drops and recreates opportunities takes the triggers
+        # with it, so the index no longer matches the table and must be rebuilt
+        triggers = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'opportunities'"
+        )}
+        if not has_fts or not triggers.issuperset(OPPORTUNITIES_FTS_TRIGGERS):
+            logger.info("Rebuilding opportunities search index")
+            conn.executescript(OPPORTUNITIES_FTS_SYNC_SQL)
+        
+        _opportunities_fts_ready = True
+        logger.info("Opportunities search indexes ready")
+    except Exception as e:
+        logger.error(f"Opportunities search index setup failed: {e}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+# scrypt cost parameters (~16 MiB, tens of ms per hash)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+def _scrypt(password, salt):
+    return hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+
 def hash_password(password):
-    """Hash password using SHA-256 with salt"""
-    salt = secrets.token_hex(16)
-    password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
-    return f"{salt}:{password_hash}"
+    """Hash password using scrypt with a random salt"""
+    salt = os.urandom(16)
+    derived = _scrypt(password, salt)
+    return f"{base64.b64encode(salt).decode()}${base64.b64encode(derived).decode()}"
 
 def verify_password(password, stored_hash):
-    """Verify password against stored hash"""
+    """Verify password against stored hash (scrypt, or legacy salted SHA-256)"""
     try:
+        if '$' in stored_hash:
+            salt, expected = (base64.b64decode(part) for part in stored_hash.split('$'))
+            return hmac.compare_digest(_scrypt(password, salt), expected)
+        # Legacy "salt:sha256hex" hashes created before the switch to scrypt
         salt, password_hash = stored_hash.split(':')
-        return hashlib.sha256((password + salt).encode()).hexdigest() == password_hash
-    except:
+        computed = hashlib.sha256((password + salt).encode()).hexdigest()
+        return hmac.compare_digest(computed, password_hash)
+    except Exception:
         return False
 
-def generate_uuid():
-    """Generate a UUID"""
-    return secrets.token_urlsafe(16)
+def password_needs_rehash(stored_hash):
+    """Whether a stored hash predates scrypt and should be replaced"""
+    return '$' not in stored_hash
 
-def generate_session_token():
-    """Generate a session token"""
-    return secrets.token_urlsafe(32)
+_urlsafe_b64encode = base64.urlsafe_b64encode
 
-def get_opportunities_connection():
-    conn = sqlite3.connect(OPPORTUNITIES_DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-@app.before_request
-def before_request():
-    """Initialize database connection for each request"""
-    g.db = get_db_connection()
+def generate_uuid():
+    """Generate a UUID (128 random bits as hex)"""
+    return os.urandom(16).hex()
 
-@app.teardown_request
-def teardown_request(exception):
-    """Close database connection after each request"""
-    if hasattr(g, 'db'):
-        g.db.close()
+def generate_session_token():
+    """Generate a session token (256 random bits, URL-safe base64)"""
+    return _urlsafe_b64encode(os.urandom(32)).rstrip(b'=').decode('ascii')
+
+def _get_cached_opportunities(key):
+    """Return a cached opportunities page if it is still fresh"""
+    entry = _opportunities_cache.get(key)
+    if entry and time.monotonic() - entry[0] < OPPORTUNITIES_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _set_cached_opportunities(key, payload):
+    """Store an opportunities page, dropping everything once the cache is full"""
+    global _opportunities_cache_rows
+    rows = len(payload['data'])
+    if rows > OPPORTUNITIES_CACHE_MAX_PAGE_ROWS:
+        return
+    with _opportunities_cache_lock:
+        if (len(_opportunities_cache) >= OPPORTUNITIES_CACHE_MAX_ENTRIES
+                or _opportunities_cache_rows + rows > OPPORTUNITIES_CACHE_MAX_ROWS):
+            _opportunities_cache.clear()
+            _opportunities_cache_rows = 0
+        previous = _opportunities_cache.get(key)
+        if previous:
+            _opportunities_cache_rows -= len(previous[1]['data'])
+        _opportunities_cache[key] = (time.monotonic(), payload)
+        _opportunities_cache_rows += rows
+
+# Only routes that query the companies DB check out a connection, so health
+# probes and the stats endpoint never touch SQLite
+def with_db(view):
+    """Check out a pooled database connection as g.db for a route"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db = db_pool.get()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db_pool.put(g.db)
+    return wrapper
+
+SESSION_TTL = 30 * 24 * 60 * 60  # 30 days, in seconds
+
+# users columns returned to the client, and their camelCase JSON names
+USER_SESSION_FIELDS = ('id', 'uuid', 'email', 'first_name', 'last_name', 'phone', 'job_title')
+USER_PROFILE_FIELDS = USER_SESSION_FIELDS + ('created_at',)
+USER_JSON_NAMES = {
+    'first_name': 'firstName',
+    'last_name': 'lastName',
+    'job_title': 'jobTitle',
+    'created_at': 'createdAt'
+}
+
+def _user_row_to_json(row, fields):
+    """Convert the given columns of a users row to a camelCase JSON dict"""
+    return {USER_JSON_NAMES.get(field, field): row[field] for field in fields}
+
+REGISTER_REQUIRED_FIELDS = ('firstName', 'lastName', 'email', 'password', 'companyName', 'primaryNaics', 'primaryKeywords')
+
+# Auth statements shared across requests. Keeping the SQL text identical lets
+# each pooled connection's statement cache reuse the prepared statement.
+SQL_SELECT_USER_ID_BY_EMAIL = 'SELECT id FROM users WHERE email = ?'
+
+SQL_SELECT_USER_BY_EMAIL = '''
+    SELECT id, uuid, email, password_hash, first_name, last_name, phone, job_title, is_active
+    FROM users WHERE email = ?
+'''
+
+SQL_INSERT_USER = '''
+    INSERT INTO users (uuid, email, password_hash, first_name, last_name, phone, job_title, email_verified, is_active)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_COMPANY = '''
+    INSERT INTO companies (uuid, name, duns_number, cage_code, uei, company_size, business_type, address,
+                         primary_naics, secondary_naics, primary_psc, secondary_psc, psc_description,
+                         primary_keywords, secondary_keywords, capabilities, certifications,
+                         is_verified, is_active, created_by)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SQL_INSERT_USER_COMPANY = '''
+    INSERT INTO user_companies (user_id, company_id, role, is_primary)
+    VALUES (?, ?, ?, ?)
+'''
+
+SQL_UPDATE_PASSWORD_HASH = 'UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?'
+
+SQL_INSERT_SESSION = '''
+    INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at, is_active)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
 
 # API Routes
 
 @app.route('/api/auth/register', methods=['POST'])
+@with_db
 def register_user():
     """Register a new user and company"""
     try:
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['firstName', 'lastName', 'email', 'password', 'companyName', 'primaryNaics', 'primaryKeywords']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Check if user already exists
-        existing_user = g.db.execute(
-            'SELECT id FROM users WHERE email = ?', (data['email'],)
-        ).fetchone()
-        
-        if existing_user:
-            return jsonify({'error': 'User already exists with this email address'}), 409
+        # Validate required fields, reporting every missing one at once
+        missing = [field for field in REGISTER_REQUIRED_FIELDS if not data.get(field)]
+        if missing:
+            return jsonify({
+                'error': f"Missing required fields: {', '.join(missing)}",
+                'fields': missing
+            }), 400
         
         # Generate UUIDs
         user_uuid = generate_uuid()
@@ -238,11 +639,19 @@ def register_user():
         # Hash password
         password_hash = hash_password(data['password'])
         
+        # Take the write lock up front so the existence check and all four
+        # inserts share one transaction (concurrent signups can't both pass)
+        g.db.execute('BEGIN IMMEDIATE')
+        
+        # Check if user already exists
+        existing_user = g.db.execute(SQL_SELECT_USER_ID_BY_EMAIL, (data['email'],)).fetchone()
+        
+        if existing_user:
+            g.db.execute('ROLLBACK')
+            return jsonify({'error': 'User already exists with this email address'}), 409
+        
         # Insert user
-        user_result = g.db.execute('''
-            INSERT INTO users (uuid, email, password_hash, first_name, last_name, phone, job_title, email_verified, is_active)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        user_result = g.db.execute(SQL_INSERT_USER, (
             user_uuid, data['email'], password_hash, data['firstName'], data['lastName'],
             data.get('phone'), data.get('jobTitle'), False, True
         ))
@@ -250,13 +659,7 @@ def register_user():
         user_id = user_result.lastrowid
         
         # Insert company
-        company_result = g.db.execute('''
-            INSERT INTO companies (uuid, name, duns_number, cage_code, uei, company_size, business_type, address,
-                                 primary_naics, secondary_naics, primary_psc, secondary_psc, psc_description,
-                                 primary_keywords, secondary_keywords, capabilities, certifications,
-                                 is_verified, is_active, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        company_result = g.db.execute(SQL_INSERT_COMPANY, (
             company_uuid, data['companyName'], data.get('dunsNumber'), data.get('cageCode'), data.get('uei'),
             data.get('companySize'), data.get('businessType'), data.get('address'),
             data['primaryNaics'], data.get('secondaryNaics'), data.get('primaryPsc'), data.get('secondaryPsc'),
@@ -267,21 +670,17 @@ def register_user():
         company_id = company_result.lastrowid
         
         # Link user to company
-        g.db.execute('''
-            INSERT INTO user_companies (user_id, company_id, role, is_primary)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, company_id, 'owner', True))
+        g.db.execute(SQL_INSERT_USER_COMPANY, (user_id, company_id, 'owner', True))
         
         # Create session
         session_token = generate_session_token()
-        expires_at = datetime.now().timestamp() + (30 * 24 * 60 * 60)  # 30 days
+        expires_at = time.time() + SESSION_TTL
         
-        g.db.execute('''
-            INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at, is_active)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, session_token, request.remote_addr, request.headers.get('User-Agent'), expires_at, True))
+        g.db.execute(SQL_INSERT_SESSION, (
+            user_id, session_token, request.remote_addr, request.headers.get('User-Agent'), expires_at, True
+        ))
         
-        g.db.commit()
+        g.db.execute('COMMIT')
         
         # Return user data (without password)
         user_data = {
@@ -304,10 +703,13 @@ def register_user():
         }), 201
         
     except Exception as e:
+        if g.db.in_transaction:
+            g.db.execute('ROLLBACK')
         logger.error(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
+@with_db
 def login_user():
     """Authenticate user and create session"""
     try:
@@ -317,10 +719,7 @@ def login_user():
             return jsonify({'error': 'Email and password are required'}), 400
         
         # Get user from database
-        user = g.db.execute('''
-            SELECT id, uuid, email, password_hash, first_name, last_name, phone, job_title, is_active
-            FROM users WHERE email = ?
-        ''', (data['email'],)).fetchone()
+        user = g.db.execute(SQL_SELECT_USER_BY_EMAIL, (data['email'],)).fetchone()
         
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
@@ -332,27 +731,20 @@ def login_user():
         if not verify_password(data['password'], user['password_hash']):
             return jsonify({'error': 'Invalid credentials'}), 401
         
+        # Upgrade legacy SHA-256 hashes now that we have the plaintext
+        if password_needs_rehash(user['password_hash']):
+            g.db.execute(SQL_UPDATE_PASSWORD_HASH, (hash_password(data['password']), user['id']))
+        
         # Create session
         session_token = generate_session_token()
-        expires_at = datetime.now().timestamp() + (30 * 24 * 60 * 60)  # 30 days
-        
-        g.db.execute('''
-            INSERT INTO user_sessions (user_id, session_token, ip_address, user_agent, expires_at, is_active)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user['id'], session_token, request.remote_addr, request.headers.get('User-Agent'), expires_at, True))
+        expires_at = time.time() + SESSION_TTL
         
-        g.db.commit()
+        g.db.execute(SQL_INSERT_SESSION, (
+            user['id'], session_token, request.remote_addr, request.headers.get('User-Agent'), expires_at, True
+        ))
         
         # Return user data
-        user_data = {
-            'id': user['id'],
-            'uuid': user['uuid'],
-            'email': user['email'],
-            'firstName': user['first_name'],
-            'lastName': user['last_name'],
-            'phone': user['phone'],
-            'jobTitle': user['job_title']
-        }
+        user_data = _user_row_to_json(user, USER_SESSION_FIELDS)
         
         return jsonify({
             'success': True,
@@ -366,6 +758,7 @@ def login_user():
         return jsonify({'error': 'Login failed'}), 500
 
 @app.route('/api/users/<int:user_id>/profile', methods=['GET'])
+@with_db
 def get_user_profile(user_id):
     """Get user profile"""
     try:
@@ -377,22 +770,14 @@ def get_user_profile(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'id': user['id'],
-            'uuid': user['uuid'],
-            'email': user['email'],
-            'firstName': user['first_name'],
-            'lastName': user['last_name'],
-            'phone': user['phone'],
-            'jobTitle': user['job_title'],
-            'createdAt': user['created_at']
-        }), 200
+        return jsonify(_user_row_to_json(user, USER_PROFILE_FIELDS)), 200
         
     except Exception as e:
         logger.error(f"Get profile error: {e}")
         return jsonify({'error': 'Failed to get profile'}), 500
 
 @app.route('/api/companies/<int:company_id>', methods=['GET'])
+@with_db
 def get_company(company_id):
     """Get company information"""
     try:
@@ -428,81 +813,101 @@ def get_user_stats(user_id):
         logger.error(f"Get stats error: {e}")
         return jsonify({'error': 'Failed to get stats'}), 500
 
+def _fts_match_query(search):
+    """Turn free text into a trigram FTS5 phrase, i.e. a case-insensitive substring match"""
+    return '"' + search.replace('"', '""') + '"'
+
+def _disable_opportunities_fts(reason):
+    """Stop using the FTS index until the next init_opportunities_search()"""
+    global _opportunities_fts_ready
+    if _opportunities_fts_ready:
+        logger.warning(f"Opportunities search index unavailable ({reason}). Falling back to LIKE search.")
+    _opportunities_fts_ready = False
+
+def _opportunities_fts_usable(conn):
+    """Whether the FTS index can be used, re-checking its sync triggers periodically"""
+    global _opportunities_fts_checked_at
+    if not _opportunities_fts_ready:
+        return False
+    now = time.monotonic()
+    if now - _opportunities_fts_checked_at >= OPPORTUNITIES_FTS_CHECK_INTERVAL:
+        _opportunities_fts_checked_at = now
+        triggers = {r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'opportunities'"
+        )}
+        if not triggers.issuperset(OPPORTUNITIES_FTS_TRIGGERS):
+            _disable_opportunities_fts('sync triggers missing')
+    return _opportunities_fts_ready
+
+def _query_opportunities(start, length, search, order_by, order_dir):
+    """Fetch one page of opportunities plus the filtered total"""
+    with opportunities_pool.connection() as conn:
+        params = []
+        if len(search) >= OPPORTUNITIES_FTS_MIN_SEARCH and _opportunities_fts_usable(conn):
+            mode = 'fts'
+            params.extend([_fts_match_query(search), f"%{search}%"])
+        elif search:
+            mode = 'like'
+            params.append(f"%{search}%")
+        else:
+            mode = 'all'
+
+        # Plain tuples zipped against the column names captured once, rather
+        # than building sqlite3.Row objects only to copy them into dicts
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.arraysize = max(length, 1)
+        try:
+            cur.execute(OPPORTUNITIES_PAGE_SQL[(mode, order_by, order_dir)], params + [length, start])
+        except sqlite3.OperationalError as e:
+            if mode != 'fts':
+                raise
+            _disable_opportunities_fts(e)
+            mode = 'like'
+            params = params[1:]
+            cur.execute(OPPORTUNITIES_PAGE_SQL[(mode, order_by, order_dir)], params + [length, start])
+        cols = tuple(d[0] for d in cur.description[:-1])
+        rows = []
+        total = None
+        for r in cur:
+            rows.append(dict(zip(cols, r)))
+            total = r[-1]
+
+        if total is None and start > 0:
+            # Paged past the end: no row to carry the total, so count directly
+            total = conn.execute(OPPORTUNITIES_COUNT_SQL[mode], params).fetchone()['cnt']
+        elif total is None:
+            total = 0
+
+    return {
+        'data': rows,
+        'recordsTotal': total,
+        'recordsFiltered': total
+    }
+
 @app.route('/api/opportunities', methods=['GET'])
 def list_opportunities():
     """Server-side paginated, sortable opportunities list (read-only)."""
     try:
-        start = int(request.args.get('start', 0))
-        length = int(request.args.get('length', 25))
+        start = max(int(request.args.get('start', 0)), 0)
+        length = min(max(int(request.args.get('length', 25)), 1), OPPORTUNITIES_MAX_PAGE_LENGTH)
         search = (request.args.get('search') or '').strip()
         order_col = request.args.get('order_col', '8')  # default posted
         order_dir = request.args.get('order_dir', 'desc').lower()
-        order_dir = 'DESC' if order_dir == 'desc' else 'ASC'
-
-        # Map DataTables column index to DB column
-        # 0 interested (virtual), 1 notice_id, 2 title, 3 agency, 4 department,
-        # 5 naics, 6 psc, 7 type, 8 posted_date, 9 response_due_date, 10 setaside
-        col_map = {
-            '1': 'notice_id',
-            '2': 'title',
-            '3': 'agency',
-            '4': 'department',
-            '5': 'naics',
-            '6': 'psc',
-            '7': 'notice_type',
-            '8': 'posted_date',
-            '9': 'response_due_date',
-            '10': 'setaside'
-        }
-        order_by = col_map.get(str(order_col), 'posted_date')
-
-        where_clause = ''
-        params = []
-        if search:
-            where_clause = """
-            WHERE (
-                COALESCE(notice_id,'') LIKE ? OR
-                COALESCE(title,'') LIKE ? OR
-                COALESCE(agency,'') LIKE ? OR
-                COALESCE(department,'') LIKE ? OR
-                COALESCE(naics,'') LIKE ? OR
-                COALESCE(psc,'') LIKE ?
-            )
-            """
-            like = f"%{search}%"
-            params.extend([like, like, like, like, like, like])
-
-        count_sql = f"SELECT COUNT(1) as cnt FROM opportunities {where_clause}"
-        data_sql = f"""
-            SELECT
-                notice_id,
-                title,
-                agency,
-                department,
-                naics,
-                psc,
-                notice_type,
-                posted_date,
-                response_due_date,
-                setaside
-            FROM opportunities
-            {where_clause}
-            ORDER BY {order_by} {order_dir}
-            LIMIT ? OFFSET ?
-        """
-
-        with get_opportunities_connection() as conn:
-            cur = conn.execute(count_sql, params)
-            total = cur.fetchone()['cnt']
-
-            cur = conn.execute(data_sql, params + [length, start])
-            rows = [dict(r) for r in cur.fetchall()]
-
-        return jsonify({
-            'data': rows,
-            'recordsTotal': total,
-            'recordsFiltered': total
-        })
+        order_dir = OPPORTUNITIES_ORDER_DIRECTIONS.get(order_dir, 'ASC')
+        order_by = OPPORTUNITIES_ORDER_COLUMNS.get(str(order_col), 'posted_date')
+
+        cache_key = (start, length, search, order_by, order_dir)
+        payload = _get_cached_opportunities(cache_key)
+        if payload is None:
+            payload = _query_opportunities(start, length, search, order_by, order_dir)
+            _set_cached_opportunities(cache_key, payload)
+
+        # Let browsers revalidate with If-None-Match and get a bodiless 304
+        response = jsonify(payload)
+        response.headers['Cache-Control'] = OPPORTUNITIES_CACHE_CONTROL
+        response.add_etag()
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"List opportunities error: {e}")
         return jsonify({'data': [], 'recordsTotal': 0, 'recordsFiltered': 0, 'error': 'Failed to load data'}), 500
@@ -512,10 +917,24 @@ def health_check():
     """Health check endpoint"""
     return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()}), 200
 
+def serve_with_gunicorn():
+    """Replace this process with gunicorn serving the app (see gunicorn.conf.py,
+    which also initializes the database before workers start)"""
+    server_dir = os.path.dirname(os.path.abspath(__file__))
+    os.execvp('gunicorn', [
+        'gunicorn', '--chdir', server_dir,
+        '-c', os.path.join(server_dir, 'gunicorn.conf.py'), 'server:app'
+    ])
+
 if __name__ == '__main__':
+    flask_env = os.environ.get('FLASK_ENV')
+    if flask_env == 'production':
+        serve_with_gunicorn()
+
     # Initialize database
     init_database()
     
-    # Run the server
+    # Run the server. The debugger and reloader (which imports everything
+    # twice) are only enabled when explicitly developing.
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=flask_env == 'development')